@@ -1,6 +1,20 @@
+import atexit
+import hashlib
 import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack, nullcontext
 from pathlib import Path
+
+import pythoncom
+import pywintypes
 import win32com.client as win32
+from tqdm import tqdm
 
 # ----------------------------------------------------------------------
 # CONFIGURATION
@@ -8,6 +22,38 @@ import win32com.client as win32
 HEADER_TEXT = "23BT521 CHEMICAL ENGINEERING LABORATORY FOR BIOTECHNOLOGISTS"
 FOOTER_TEXT = "GNANAMANI COLLEGE OF TECHNOLOGY"
 
+# Margins and header/footer distances, precomputed in points
+POINTS_PER_CM = 28.3464567  # 1 cm ≈ 28.3464567 points
+TOP_MARGIN = 2.5 * POINTS_PER_CM
+BOTTOM_MARGIN = 2.0 * POINTS_PER_CM
+LEFT_MARGIN = 2.5 * POINTS_PER_CM
+RIGHT_MARGIN = 2.0 * POINTS_PER_CM
+HEADER_FOOTER_DISTANCE = 1.0 * POINTS_PER_CM
+
+# Bump by hand whenever code that shapes the output changes: fonts,
+# colours, alignment or paper size in apply_header_footer / HF_MACRO,
+# set_page_setup, the image fitting in _scale_shape and
+# resize_images_via_layout, or _stamp_header_footer. The constants above
+# are hashed automatically.
+STYLE_REVISION = 2
+
+# Changes whenever the styling changes, so cached templates, .docx files
+# and PDFs built from older settings are never reused.
+STYLE_VERSION = hashlib.sha1(
+    repr(
+        (
+            STYLE_REVISION,
+            HEADER_TEXT,
+            FOOTER_TEXT,
+            TOP_MARGIN,
+            BOTTOM_MARGIN,
+            LEFT_MARGIN,
+            RIGHT_MARGIN,
+            HEADER_FOOTER_DISTANCE,
+        )
+    ).encode()
+).hexdigest()[:12]
+
 # Word numeric constants (no win32com.client.constants used)
 WD_PAPER_A4 = 7                         # WdPaperSize.wdPaperA4 :contentReference[oaicite:0]{index=0}
 WD_ORIENT_PORTRAIT = 0                  # WdOrientation.wdOrientPortrait :contentReference[oaicite:1]{index=1}
@@ -20,21 +66,37 @@ WD_COLOR_GRAY25 = 12632256              # WdColor.wdColorGray25 :contentReferenc
 WD_COLOR_BLACK = 0                      # WdColor.wdColorBlack :contentReference[oaicite:8]{index=8}
 WD_EXPORT_FORMAT_PDF = 17               # WdExportFormat.wdExportFormatPDF :contentReference[oaicite:9]{index=9}
 WD_EXPORT_OPTIMIZE_FOR_PRINT = 0        # WdExportOptimizeFor.wdExportOptimizeForPrint :contentReference[oaicite:10]{index=10}
+WD_EXPORT_OPTIMIZE_FOR_ON_SCREEN = 1    # WdExportOptimizeFor.wdExportOptimizeForOnScreen
 WD_EXPORT_RANGE_ALL_DOC = 0             # WdExportRange.wdExportAllDocument :contentReference[oaicite:11]{index=11}
 WD_EXPORT_ITEM_DOC_CONTENT = 0          # WdExportItem.wdExportDocumentContent :contentReference[oaicite:12]{index=12}
+WD_EXPORT_CREATE_NO_BOOKMARKS = 0       # WdExportCreateBookmarks.wdExportCreateNoBookmarks
 WD_EXPORT_CREATE_HEADING_BOOKMARKS = 1  # WdExportCreateBookmarks.wdExportCreateHeadingBookmarks :contentReference[oaicite:13]{index=13}
 WD_BREAK_PAGE = 7                       # WdBreakType.wdPageBreak :contentReference[oaicite:14]{index=14}
 WD_COLLAPSE_END = 0                     # WdCollapseDirection.wdCollapseEnd :contentReference[oaicite:15]{index=15}
+WD_FORMAT_XML_DOCUMENT = 12             # WdSaveFormat.wdFormatXMLDocument
+WD_FORMAT_XML_TEMPLATE = 14             # WdSaveFormat.wdFormatXMLTemplate
+WD_ALERTS_NONE = 0                      # WdAlertLevel.wdAlertsNone
+MSO_TRUE = -1                           # MsoTriState.msoTrue
+VBEXT_CT_STD_MODULE = 1                 # vbext_ComponentType.vbext_ct_StdModule
+
+# LibreOffice executable for backend="soffice" (must be on PATH)
+SOFFICE = "soffice"
+
+# Per-file intermediate .docx files and the Word template are cached here,
+# inside the output dir
+CACHE_DIR_NAME = ".html2pdf_cache"
+
+# Leftover *.tmp.* files older than this are from a crashed run.
+STALE_TMP_SECONDS = 24 * 60 * 60
+
+# Each worker process drives its own Word instance; beyond ~4 Word servers
+# COM serialization eats the gain.
+MAX_WORKERS = 4
 
 
 # ----------------------------------------------------------------------
 # HELPERS
 # ----------------------------------------------------------------------
-def cm_to_points(cm: float) -> float:
-    """Convert centimeters to Word points."""
-    return cm * 28.3464567  # 1 cm ≈ 28.3464567 points
-
-
 def set_page_setup(doc):
     """Set A4 portrait and reasonable margins."""
     ps = doc.PageSetup
@@ -43,24 +105,23 @@ def set_page_setup(doc):
     ps.PaperSize = WD_PAPER_A4
     ps.Orientation = WD_ORIENT_PORTRAIT
 
-    # Margins (in points) – adjust if you want slightly different margins
-    ps.TopMargin = cm_to_points(2.5)
-    ps.BottomMargin = cm_to_points(2.0)
-    ps.LeftMargin = cm_to_points(2.5)
-    ps.RightMargin = cm_to_points(2.0)
+    # Margins (in points) – adjust TOP_MARGIN etc. in CONFIGURATION
+    ps.TopMargin = TOP_MARGIN
+    ps.BottomMargin = BOTTOM_MARGIN
+    ps.LeftMargin = LEFT_MARGIN
+    ps.RightMargin = RIGHT_MARGIN
 
     # Header / footer distances
-    ps.HeaderDistance = cm_to_points(1.0)
-    ps.FooterDistance = cm_to_points(1.0)
+    ps.HeaderDistance = HEADER_FOOTER_DISTANCE
+    ps.FooterDistance = HEADER_FOOTER_DISTANCE
 
 
-def resize_images_to_fit(doc):
+def _content_area(ps):
     """
-    Scale all images so they fit within the available A4 content
-    area (both horizontally and vertically).
+    Width and height (points) available for images: the page minus its
+    margins and the header/footer distances, so an image never runs into
+    the header or footer and forces a second layout pass.
     """
-    ps = doc.PageSetup
-
     content_width = ps.PageWidth - ps.LeftMargin - ps.RightMargin
     content_height = (
         ps.PageHeight
@@ -75,36 +136,70 @@ def resize_images_to_fit(doc):
         content_width = ps.PageWidth * 0.9
         content_height = ps.PageHeight * 0.8
 
-    # InlineShapes (images in text flow)
-    for ish in list(doc.InlineShapes):
-        try:
-            w = ish.Width
-            h = ish.Height
-            if w <= 0 or h <= 0:
-                continue
+    return content_width, content_height
 
-            scale = min(1.0, content_width / w, content_height / h)
-            if scale < 1.0:
-                ish.Width = w * scale
-                ish.Height = h * scale
-        except Exception:
-            # Ignore problematic shapes and continue
-            continue
 
-    # Floating shapes
-    for shp in list(doc.Shapes):
+def _scale_shape(shape, content_width, content_height):
+    """Shrink one InlineShape or Shape to fit the content area."""
+    try:
+        # Only resize if it has meaningful dimensions
+        w, h = shape.Width, shape.Height
+        if w <= 0 or h <= 0:
+            return
+        if w <= content_width and h <= content_height:
+            return  # already fits, no write needed
+
+        scale = min(content_width / w, content_height / h)
+        shape.Width = w * scale
+        shape.Height = h * scale
+    except pywintypes.com_error:
+        # Ignore problematic shapes and continue
+        return
+
+
+def resize_images_to_fit(doc):
+    """
+    Scale all images so they fit within the available A4 content
+    area (both horizontally and vertically).
+    """
+    content_width, content_height = _content_area(doc.PageSetup)
+
+    # InlineShapes (images in text flow) and floating Shapes. Indexing the
+    # 1-based collections creates one COM proxy at a time instead of a
+    # list of all of them, and Count is fetched only once.
+    for shapes in (doc.InlineShapes, doc.Shapes):
+        count = shapes.Count
+        for i in range(1, count + 1):
+            _scale_shape(shapes(i), content_width, content_height)
+
+
+def resize_images_via_layout(doc):
+    """
+    Cheaper alternative to resize_images_to_fit: only the width is read,
+    so a picture that fits costs one COM call instead of two. Oversized
+    pictures get their aspect ratio locked and ScaleWidth lowered, so
+    Word works out the new height in-process.
+
+    Only the width is constrained and floating shapes are left alone.
+    """
+    ps = doc.PageSetup
+    ps.MirrorMargins = False
+    max_width, _ = _content_area(ps)
+
+    inline_shapes = doc.InlineShapes
+    count = inline_shapes.Count
+    for i in range(1, count + 1):
+        ish = inline_shapes(i)
         try:
-            # Only resize if it has meaningful dimensions
-            w = shp.Width
-            h = shp.Height
-            if w <= 0 or h <= 0:
+            w = ish.Width
+            if w <= max_width:  # already fits (or has no size)
                 continue
 
-            scale = min(1.0, content_width / w, content_height / h)
-            if scale < 1.0:
-                shp.Width = w * scale
-                shp.Height = h * scale
-        except Exception:
+            # ScaleWidth is a percentage of the *original* size, which an
+            # <img width=...> may already have reduced; scale from it.
+            ish.LockAspectRatio = MSO_TRUE
+            ish.ScaleWidth = ish.ScaleWidth * max_width / w
+        except pywintypes.com_error:
             continue
 
 
@@ -117,78 +212,208 @@ def apply_header_footer(doc):
         2) FOOTER_TEXT right, grey, italic, small
     to every section.
     """
-    for section in doc.Sections:
-        # ----------------- HEADER -----------------
-        header = section.Headers(WD_HEADER_FOOTER_PRIMARY)
-        h_range = header.Range
-        h_range.Text = HEADER_TEXT
-        h_range.ParagraphFormat.Alignment = WD_ALIGN_PARAGRAPH_RIGHT
+    # Sections 2..N link to section 1, so the content (and the PAGE
+    # field) is built only once however many sections there are.
+    section = doc.Sections(1)
 
-        h_font = h_range.Font
-        h_font.Size = 9
-        h_font.Italic = True
-        h_font.Color = WD_COLOR_GRAY25
+    # ----------------- HEADER -----------------
+    header = section.Headers(WD_HEADER_FOOTER_PRIMARY)
+    h_range = header.Range
+    h_range.Text = HEADER_TEXT
+    h_range.ParagraphFormat.Alignment = WD_ALIGN_PARAGRAPH_RIGHT
 
-        # ----------------- FOOTER -----------------
-        footer = section.Footers(WD_HEADER_FOOTER_PRIMARY)
-        f_range = footer.Range
+    h_font = h_range.Font
+    h_font.Size = 9
+    h_font.Italic = True
+    h_font.Color = WD_COLOR_GRAY25
 
-        # Clear existing footer content
-        f_range.Text = ""
+    # ----------------- FOOTER -----------------
+    footer = section.Footers(WD_HEADER_FOOTER_PRIMARY)
+    f_range = footer.Range
 
-        # 1) Page number paragraph (centered, bold, black)
-        # After setting Text = "", footer.Range still has one empty paragraph.
-        page_para = footer.Range.Paragraphs(1)
-        page_rng = page_para.Range
+    # Clear existing footer content
+    f_range.Text = ""
 
-        page_rng.Text = ""  # ensure empty before inserting field
-        page_rng.ParagraphFormat.Alignment = WD_ALIGN_PARAGRAPH_CENTER
+    # 1) Page number paragraph (centered, bold, black)
+    # After setting Text = "", footer.Range still has one empty paragraph.
+    page_para = footer.Range.Paragraphs(1)
+    page_rng = page_para.Range
 
-        p_font = page_rng.Font
-        p_font.Bold = True
-        p_font.Italic = False
-        p_font.Color = WD_COLOR_BLACK
+    page_rng.Text = ""  # ensure empty before inserting field
+    page_rng.ParagraphFormat.Alignment = WD_ALIGN_PARAGRAPH_CENTER
 
-        # Add PAGE field
-        page_rng.Fields.Add(page_rng, WD_FIELD_PAGE)
+    p_font = page_rng.Font
+    p_font.Bold = True
+    p_font.Italic = False
+    p_font.Color = WD_COLOR_BLACK
 
-        # Ensure a new paragraph after the page number
-        page_rng.InsertParagraphAfter()
+    # Add PAGE field
+    page_rng.Fields.Add(page_rng, WD_FIELD_PAGE)
 
-        # 2) Footer text paragraph (right, grey, italic, small)
-        all_paras = footer.Range.Paragraphs
-        footer_para = all_paras(all_paras.Count)  # last paragraph
-        footer_rng = footer_para.Range
+    # Ensure a new paragraph after the page number
+    page_rng.InsertParagraphAfter()
 
-        footer_rng.Text = FOOTER_TEXT
-        footer_rng.ParagraphFormat.Alignment = WD_ALIGN_PARAGRAPH_RIGHT
+    # 2) Footer text paragraph (right, grey, italic, small)
+    all_paras = footer.Range.Paragraphs
+    footer_para = all_paras(all_paras.Count)  # last paragraph
+    footer_rng = footer_para.Range
 
-        f_font = footer_rng.Font
-        f_font.Size = 9
-        f_font.Italic = True
-        f_font.Color = WD_COLOR_GRAY25
+    footer_rng.Text = FOOTER_TEXT
+    footer_rng.ParagraphFormat.Alignment = WD_ALIGN_PARAGRAPH_RIGHT
 
+    f_font = footer_rng.Font
+    f_font.Size = 9
+    f_font.Italic = True
+    f_font.Color = WD_COLOR_GRAY25
 
-def export_to_pdf(doc, pdf_path: Path):
-    """Export the active Word document to PDF with print-quality settings."""
+    for i in range(2, doc.Sections.Count + 1):
+        section = doc.Sections(i)
+        section.Headers(WD_HEADER_FOOTER_PRIMARY).LinkToPrevious = True
+        section.Footers(WD_HEADER_FOOTER_PRIMARY).LinkToPrevious = True
+
+
+# The same steps as apply_header_footer in VBA, so Word runs them
+# in-process instead of one cross-process COM call per property.
+HF_MACRO_MODULE = "Html2PdfHF"
+HF_MACRO = f"""
+Sub ApplyHF(hText, fText)
+    Dim sec, rng, paras, i
+    Set sec = ThisDocument.Sections(1)
+
+    Set rng = sec.Headers({WD_HEADER_FOOTER_PRIMARY}).Range
+    rng.Text = hText
+    rng.ParagraphFormat.Alignment = {WD_ALIGN_PARAGRAPH_RIGHT}
+    rng.Font.Size = 9
+    rng.Font.Italic = True
+    rng.Font.Color = {WD_COLOR_GRAY25}
+
+    sec.Footers({WD_HEADER_FOOTER_PRIMARY}).Range.Text = ""
+    Set rng = sec.Footers({WD_HEADER_FOOTER_PRIMARY}).Range.Paragraphs(1).Range
+    rng.Text = ""
+    rng.ParagraphFormat.Alignment = {WD_ALIGN_PARAGRAPH_CENTER}
+    rng.Font.Bold = True
+    rng.Font.Italic = False
+    rng.Font.Color = {WD_COLOR_BLACK}
+    rng.Fields.Add rng, {WD_FIELD_PAGE}
+    rng.InsertParagraphAfter
+
+    Set paras = sec.Footers({WD_HEADER_FOOTER_PRIMARY}).Range.Paragraphs
+    Set rng = paras(paras.Count).Range
+    rng.Text = fText
+    rng.ParagraphFormat.Alignment = {WD_ALIGN_PARAGRAPH_RIGHT}
+    rng.Font.Size = 9
+    rng.Font.Italic = True
+    rng.Font.Color = {WD_COLOR_GRAY25}
+
+    For i = 2 To ThisDocument.Sections.Count
+        ThisDocument.Sections(i).Headers({WD_HEADER_FOOTER_PRIMARY}).LinkToPrevious = True
+        ThisDocument.Sections(i).Footers({WD_HEADER_FOOTER_PRIMARY}).LinkToPrevious = True
+    Next i
+End Sub
+"""
+
+
+def apply_header_footer_via_macro(doc) -> bool:
+    """
+    Apply the header/footer with one Run of a VBA macro injected into
+    `doc` itself (not Normal.dotm, which would persist it).
+
+    Word must have "Trust access to the VBA project object model"
+    enabled; returns False if injection or the run fails, so the caller
+    can fall back to apply_header_footer.
+    """
+    try:
+        component = doc.VBProject.VBComponents.Add(VBEXT_CT_STD_MODULE)
+    except pywintypes.com_error:
+        return False
+
+    try:
+        component.Name = HF_MACRO_MODULE
+        component.CodeModule.AddFromString(HF_MACRO)
+        doc.Application.Run(f"{HF_MACRO_MODULE}.ApplyHF", HEADER_TEXT, FOOTER_TEXT)
+        return True
+    except pywintypes.com_error:
+        return False
+    finally:
+        try:
+            doc.VBProject.VBComponents.Remove(component)
+        except pywintypes.com_error:
+            # A leftover module is harmless: .dotx cannot store macros
+            # and output documents are closed unsaved.
+            pass
+
+
+def export_to_pdf(
+    doc,
+    pdf_path: Path,
+    optimize_for: int = WD_EXPORT_OPTIMIZE_FOR_ON_SCREEN,
+    include_doc_props: bool = False,
+    create_bookmarks: int = WD_EXPORT_CREATE_NO_BOOKMARKS,
+    doc_structure_tags: bool = False,
+    bitmap_missing_fonts: bool = False,
+):
+    """
+    Export the active Word document to PDF.
+
+    The defaults skip the expensive extras (accessibility tags, bookmarks,
+    document properties, font bitmaps, print optimization). For the old
+    print-quality output pass WD_EXPORT_OPTIMIZE_FOR_PRINT,
+    WD_EXPORT_CREATE_HEADING_BOOKMARKS and True for the flags.
+    """
     doc.ExportAsFixedFormat(
         OutputFileName=str(pdf_path),
         ExportFormat=WD_EXPORT_FORMAT_PDF,
         OpenAfterExport=False,
-        OptimizeFor=WD_EXPORT_OPTIMIZE_FOR_PRINT,
+        OptimizeFor=optimize_for,
         Range=WD_EXPORT_RANGE_ALL_DOC,
         From=1,
         To=1,
         Item=WD_EXPORT_ITEM_DOC_CONTENT,
-        IncludeDocProps=True,
+        IncludeDocProps=include_doc_props,
         KeepIRM=True,
-        CreateBookmarks=WD_EXPORT_CREATE_HEADING_BOOKMARKS,
-        DocStructureTags=True,
-        BitmapMissingFonts=True,
+        CreateBookmarks=create_bookmarks,
+        DocStructureTags=doc_structure_tags,
+        BitmapMissingFonts=bitmap_missing_fonts,
         UseISO19005_1=False,
     )
 
 
+def _template_path(cache_dir: Path) -> Path:
+    """Where the template for the current STYLE_VERSION lives."""
+    return cache_dir / f"template-{STYLE_VERSION}.dotx"
+
+
+def ensure_template(word, cache_dir: Path) -> Path:
+    """
+    Return the Word template in `cache_dir`, building it with
+    set_page_setup and the header/footer code the first time. Documents
+    created from it already carry the layout, so neither step runs per
+    batch.
+    """
+    template_path = _template_path(cache_dir)
+    if template_path.exists():
+        return template_path
+
+    # Per-process name, so concurrent runs never write the same file.
+    tmp_path = cache_dir / f"template-{STYLE_VERSION}.{os.getpid()}.tmp.dotx"
+    doc = word.Documents.Add()
+    try:
+        try:
+            set_page_setup(doc)
+            if not apply_header_footer_via_macro(doc):
+                apply_header_footer(doc)
+            doc.SaveAs2(str(tmp_path), FileFormat=WD_FORMAT_XML_TEMPLATE)
+        finally:
+            doc.Close(SaveChanges=False)
+
+        # Publish atomically so a concurrent run never opens a half-written
+        # file.
+        os.replace(tmp_path, template_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    return template_path
+
+
 def _html_sort_key(path: Path):
     """Sort numerically when file names are like '1.html', '2.html', etc."""
     try:
@@ -197,57 +422,614 @@ def _html_sort_key(path: Path):
         return (1, path.stem.lower())
 
 
-def convert_all_html_to_pdf(
-    input_dir: str,
-    output_dir: str,
-    output_filename: str = "combined_output.pdf",
-    visible: bool = False,
-):
-    input_path = Path(input_dir)
-    output_path = Path(output_dir)
-    output_pdf = output_path / output_filename
+def _list_html_files(input_path: Path):
+    """Return the .html/.htm files in `input_path` from a single scandir pass."""
+    with os.scandir(input_path) as entries:
+        html_files = [
+            Path(entry.path)
+            for entry in entries
+            if entry.name.lower().endswith((".html", ".htm")) and entry.is_file()
+        ]
+    return sorted(html_files, key=_html_sort_key)
+
+
+# ----------------------------------------------------------------------
+# WORD SESSION
+# ----------------------------------------------------------------------
+# COM must be initialized once per thread, so the flag is thread-local.
+_com_state = threading.local()
+
+
+def _ensure_com_initialized():
+    """Call CoInitialize only on the first use in the current thread."""
+    if not getattr(_com_state, "initialized", False):
+        pythoncom.CoInitialize()
+        _com_state.initialized = True
+
+
+class WordSession:
+    """
+    Own one Word.Application for as long as the `with` block lasts, so
+    several batches can share it and skip Word's startup cost:
+
+        with WordSession() as word:
+            convert_all_html_to_pdf(dir_a, out_a, word=word)
+            convert_all_html_to_pdf(dir_b, out_b, word=word)
+    """
+
+    def __init__(self, visible: bool = False):
+        self.visible = visible
+        self.word = None
+
+    def __enter__(self):
+        _ensure_com_initialized()
+        # DispatchEx forces a new out-of-process server instead of
+        # attaching to (and later quitting) a Word the user has open.
+        self.word = win32.DispatchEx("Word.Application")
+        self.word.Visible = self.visible
+        return self.word
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.word is not None:
+            self.word.Quit()
+            self.word = None
+        return False
+
+
+def _user_options(word):
+    """
+    Snapshot the proofing, pagination and autosave options. Unlike
+    ScreenUpdating and DisplayAlerts these are per-user settings that any
+    Word instance writes back to the registry when it quits.
+    """
+    opts = word.Options
+    return (
+        opts.Pagination,
+        opts.CheckSpellingAsYouType,
+        opts.CheckGrammarAsYouType,
+        opts.SaveInterval,
+    )
+
+
+def _set_user_options(word, values):
+    """Apply a tuple returned by _user_options."""
+    opts = word.Options
+    (
+        opts.Pagination,
+        opts.CheckSpellingAsYouType,
+        opts.CheckGrammarAsYouType,
+        opts.SaveInterval,
+    ) = values
+
+
+def _silence_word(word):
+    """
+    Switch off screen updates, alerts, background repagination, proofing
+    and autosave while we drive Word; the final PDF export lays out the
+    document anyway.
+
+    Returns only the per-instance settings, for _restore_word. The
+    per-user options must be snapshotted with _user_options before any
+    Word instance is silenced and put back with _set_user_options.
+    """
+    saved = (word.ScreenUpdating, word.DisplayAlerts)
+
+    word.ScreenUpdating = False
+    word.DisplayAlerts = WD_ALERTS_NONE
+    _set_user_options(word, (False, False, False, 0))
+    return saved
 
-    print(f"Input directory : {input_path}")
-    print(f"Output directory: {output_path}")
-    print(f"Combined PDF   : {output_pdf}")
 
-    html_files = sorted(input_path.glob("*.html"), key=_html_sort_key)
-    if not html_files:
-        print("No HTML files found. Nothing to do.")
-        return
+def _restore_word(word, saved):
+    """Put back the per-instance settings returned by _silence_word."""
+    word.ScreenUpdating, word.DisplayAlerts = saved
 
-    word = win32.Dispatch("Word.Application")
-    word.Visible = visible
 
-    output_doc = word.Documents.Add()
+# ----------------------------------------------------------------------
+# WORKER PROCESSES
+# ----------------------------------------------------------------------
+_worker_session = None
+_worker_word = None
 
+
+def _init_worker():
+    """Start one private Word server for this worker process."""
+    global _worker_session, _worker_word
+    _worker_session = WordSession()
+    _worker_word = _worker_session.__enter__()
+    # The parent restores the per-user options once every worker has quit.
+    _silence_word(_worker_word)
+    atexit.register(_shutdown_worker)
+
+
+def _shutdown_worker():
+    """Quit the worker's Word server when the pool shuts down."""
+    global _worker_word
+    _worker_session.__exit__(None, None, None)
+    _worker_word = None
+    pythoncom.CoUninitialize()
+
+
+def _convert_one(
+    html_path: Path, docx_path: Path, fit_images_via_layout: bool = False
+) -> Path:
+    """
+    Open one HTML file in the worker's Word instance, lay it out on the
+    A4 content area and save it as .docx for the combining step.
+    """
+    # Save under a temporary name and publish atomically, so an
+    # interrupted run never leaves a truncated .docx that looks cached.
+    tmp_path = docx_path.with_name(f"{docx_path.stem}.{os.getpid()}.tmp.docx")
+
+    # Read-only, no MRU entry and no dialogs: parallel workers must not
+    # contend for file locks or block on a prompt nobody can see.
+    doc = _worker_word.Documents.Open(
+        FileName=str(html_path),
+        ConfirmConversions=False,
+        ReadOnly=True,
+        AddToRecentFiles=False,
+        PasswordDocument="",
+        Revert=False,
+        Visible=False,
+        OpenAndRepair=False,
+        NoEncodingDialog=True,
+    )
     try:
-        for index, html_file in enumerate(html_files):
-            print(f"\nProcessing: {html_file.name}")
+        try:
+            set_page_setup(doc)
+
+            # Text-only snippets (the common case) have nothing to fit.
+            if doc.InlineShapes.Count or doc.Shapes.Count:
+                if fit_images_via_layout:
+                    resize_images_via_layout(doc)
+                else:
+                    resize_images_to_fit(doc)
+
+            doc.SaveAs2(str(tmp_path), FileFormat=WD_FORMAT_XML_DOCUMENT)
+        finally:
+            doc.Close(SaveChanges=False)
+
+        os.replace(tmp_path, docx_path)
+    finally:
+        # Only still there if saving or publishing failed.
+        tmp_path.unlink(missing_ok=True)
+    return docx_path
+
+
+def _combine_into_pdf(word, jobs, template: Path, output_pdf: Path) -> bool:
+    """
+    Merge the .docx files in order and export one PDF. `jobs` holds
+    (html_file, docx_file, future) tuples; future is None for a cached
+    .docx and shared by all jobs with the same content. Returns False if
+    any file had to be skipped; output_pdf is left untouched if none could
+    be inserted. A broken worker pool (e.g. Word failed to start in
+    _init_worker) fails every future, so it is re-raised instead.
+    """
+    # The template already provides page setup, header and footer.
+    output_doc = word.Documents.Add(Template=str(template))
+
+    try:
+        inserted = 0
+        failed = 0
+        # Files are merged in order as each worker result arrives; the bar
+        # replaces per-file prints, which serialize on the console.
+        for html_file, docx_file, future in tqdm(jobs, desc="HTML→PDF"):
             try:
+                if future is not None:
+                    try:
+                        future.result()
+                    except BrokenProcessPool:
+                        raise
+                    except Exception:
+                        # The conversion itself failed: never cache it.
+                        docx_file.unlink(missing_ok=True)
+                        raise
+
                 rng = output_doc.Content
                 rng.Collapse(Direction=WD_COLLAPSE_END)
 
-                if index > 0:
+                if inserted > 0:
                     rng.InsertBreak(WD_BREAK_PAGE)
 
-                rng.InsertFile(str(html_file), ConfirmConversions=False)
-                print("  ✓ Inserted into combined document")
+                rng.InsertFile(str(docx_file), ConfirmConversions=False)
+                inserted += 1
 
+            except BrokenProcessPool:
+                raise
             except Exception as e:
-                print(f"  ✖ Failed for {html_file.name}: {e}")
+                failed += 1
+                tqdm.write(f"  ✖ Failed for {html_file.name}: {e}")
 
-        # After all files are inserted, apply the same formatting steps once.
-        set_page_setup(output_doc)
-        resize_images_to_fit(output_doc)
-        apply_header_footer(output_doc)
+        if inserted == 0:
+            # Don't replace a good PDF from an earlier run with an empty one.
+            print("\nNo file could be converted; PDF not written.")
+            return False
 
+        # Images were already fitted per file by the workers. Background
+        # pagination is off (_silence_word), so lay the merged document
+        # out exactly once here rather than after every insertion.
+        output_doc.Repaginate()
         export_to_pdf(output_doc, output_pdf)
         print(f"\nAll HTML files combined into: {output_pdf}")
 
     finally:
         output_doc.Close(SaveChanges=False)
-        word.Quit()
+
+    return failed == 0
+
+
+def _convert_with_word(
+    html_files,
+    digests,
+    cache_dir: Path,
+    output_pdf: Path,
+    visible: bool,
+    word,
+    fit_images_via_layout: bool,
+) -> bool:
+    """Word backend of convert_all_html_to_pdf; returns True if no file failed."""
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    layout = "-layout" if fit_images_via_layout else ""
+    docx_files = [
+        cache_dir / f"{digest}-{STYLE_VERSION}{layout}.docx" for digest in digests
+    ]
+    # Identical inputs share a cache file, so convert each missing one once.
+    pending = {}
+    for html_file, docx_file in zip(html_files, docx_files):
+        if not docx_file.exists():
+            pending.setdefault(docx_file, html_file)
+
+    if pending:
+        workers = min(os.cpu_count() or 1, MAX_WORKERS, len(pending))
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    else:
+        pool = nullcontext()
+    session = WordSession(visible) if word is None else nullcontext(word)
+
+    with session as word:
+        # Snapshot before any worker can silence (and on Quit persist) the
+        # per-user options; restored after the pool has shut down.
+        user_options = _user_options(word)
+        try:
+            with pool as executor:
+                # HTML import is the expensive part and independent per
+                # file, so it runs in the pool; only the cheap .docx merge
+                # is serial.
+                futures = {
+                    docx_file: executor.submit(
+                        _convert_one, html_file, docx_file, fit_images_via_layout
+                    )
+                    for docx_file, html_file in pending.items()
+                }
+                jobs = [
+                    (html_file, docx_file, futures.get(docx_file))
+                    for html_file, docx_file in zip(html_files, docx_files)
+                ]
+
+                saved = _silence_word(word)
+                try:
+                    template = ensure_template(word, cache_dir)
+                    ok = _combine_into_pdf(word, jobs, template, output_pdf)
+                finally:
+                    _restore_word(word, saved)
+        finally:
+            _set_user_options(word, user_options)
+
+    _prune_cache(cache_dir, output_pdf, [*docx_files, _template_path(cache_dir)])
+    return ok
+
+
+def _prune_cache(cache_dir: Path, output_pdf: Path, used):
+    """
+    Drop cache files this batch no longer uses. The cache dir is shared by
+    every PDF written to the same output dir, so each batch records what
+    it uses in a manifest next to its PDF and only files that were in its
+    previous manifest, and are in no other manifest, are removed.
+    """
+    manifest = output_pdf.with_name(output_pdf.name + ".manifest")
+    previous = set(manifest.read_text().split()) if manifest.exists() else set()
+    current = {path.name for path in used}
+    manifest.write_text("\n".join(sorted(current)) + "\n")
+
+    in_use = set(current)
+    for other in output_pdf.parent.glob("*.manifest"):
+        if other != manifest:
+            in_use.update(other.read_text().split())
+    for name in previous - in_use:
+        (cache_dir / name).unlink(missing_ok=True)
+
+    # *.tmp.* files may belong to a concurrent run that is still saving;
+    # only ones old enough to be from a crashed run are removed.
+    cutoff = time.time() - STALE_TMP_SECONDS
+    for tmp in cache_dir.glob("*.tmp.*"):
+        try:
+            if tmp.stat().st_mtime < cutoff:
+                tmp.unlink()
+        except OSError:
+            pass  # gone already, or still locked by its writer
+
+
+def _file_digest(path: Path) -> str:
+    """Content hash of one input file."""
+    return hashlib.blake2b(path.read_bytes(), digest_size=16).hexdigest()
+
+
+def _scan_inputs(input_path: Path):
+    """List the input files and hash them (runs off the main thread)."""
+    html_files = _list_html_files(input_path)
+    return html_files, [_file_digest(html_file) for html_file in html_files]
+
+
+def _batch_key(html_files, digests, *options) -> str:
+    """Hash of everything the combined PDF depends on."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in (STYLE_VERSION, *options):
+        h.update(f"{part}\0".encode())
+    for html_file, digest in zip(html_files, digests):
+        h.update(f"{html_file.name}\0{digest}\0".encode())
+    return h.hexdigest()
+
+
+def convert_all_html_to_pdf(
+    input_dir: str,
+    output_dir: str,
+    output_filename: str = "combined_output.pdf",
+    visible: bool = False,
+    word=None,
+    fit_images_via_layout: bool = False,
+    backend: str = "word",
+):
+    """
+    Combine every HTML file in `input_dir` into one PDF.
+
+    Pass `word` (e.g. from a WordSession) to reuse a running Word instance
+    across calls; otherwise one is started and quit for this batch.
+    `fit_images_via_layout` switches to the cheaper, width-only
+    resize_images_via_layout.
+
+    backend="soffice" converts with LibreOffice instead of Word (needs
+    `pikepdf`); the Word-only options are then ignored.
+
+    Runs are incremental: nothing is redone when no input or style
+    setting changed, and only changed files are re-imported otherwise.
+    A file counts as changed only when its HTML bytes do: edited images
+    or CSS in its `*_files/` folder are not noticed, and identical HTML
+    from another input dir reuses the .docx built from that dir's
+    images. Delete the `.html2pdf_cache` folder (and the PDF's `.sha`
+    file) to force a full rebuild after such edits.
+    """
+    if backend not in ("word", "soffice"):
+        raise ValueError(f"Unknown backend: {backend!r}")
+
+    input_path = Path(input_dir)
+    output_path = Path(output_dir)
+    output_pdf = output_path / output_filename
+
+    print(f"Input directory : {input_path}")
+    print(f"Output directory: {output_path}")
+    print(f"Combined PDF   : {output_pdf}")
+
+    sidecar = output_pdf.with_name(output_pdf.name + ".sha")
+
+    with ExitStack() as stack:
+        # Word needs seconds to start, so list and hash the inputs on a
+        # helper thread meanwhile. COM objects stay on this thread. Word
+        # is only started early when a rebuild is certain, i.e. there is
+        # no sidecar from a previous clean run.
+        scanner = stack.enter_context(ThreadPoolExecutor(max_workers=1))
+        scan = scanner.submit(_scan_inputs, input_path)
+        if backend == "word" and word is None and not sidecar.exists():
+            word = stack.enter_context(WordSession(visible))
+
+        html_files, digests = scan.result()
+        if not html_files:
+            print("No HTML files found. Nothing to do.")
+            return
+
+        batch_key = _batch_key(html_files, digests, backend, fit_images_via_layout)
+        if (
+            output_pdf.exists()
+            and sidecar.exists()
+            and sidecar.read_text().strip() == batch_key
+        ):
+            print("\nNo changes since the last run; combined PDF is cached.")
+            return
+
+        if backend == "soffice":
+            ok = _convert_with_soffice(html_files, output_pdf)
+        else:
+            ok = _convert_with_word(
+                html_files,
+                digests,
+                output_path / CACHE_DIR_NAME,
+                output_pdf,
+                visible,
+                word,
+                fit_images_via_layout,
+            )
+
+    # A PDF with skipped files must be rebuilt next time.
+    if ok:
+        sidecar.write_text(batch_key)
+    else:
+        sidecar.unlink(missing_ok=True)
+
+
+# ----------------------------------------------------------------------
+# LIBREOFFICE BACKEND
+# ----------------------------------------------------------------------
+# Standard-14 Courier has a fixed 600/1000 em advance, so centred and
+# right-aligned text can be placed without loading font metrics.
+COURIER_ADVANCE = 0.6
+GRAY25 = 192 / 255  # same grey as WD_COLOR_GRAY25 (0xC0C0C0)
+
+
+def _stamp_header_footer(pdf):
+    """
+    Approximate apply_header_footer on every page of a pikepdf.Pdf: the
+    header, page number and footer text with the same sizes, colours and
+    alignment, in Courier instead of Word's body font. They are drawn in
+    the margins that _copy_with_page_style reserves.
+    """
+    import pikepdf
+    from pikepdf import Name, Operator
+
+    def font(base_font):
+        return pdf.make_indirect(
+            pikepdf.Dictionary(
+                Type=Name.Font, Subtype=Name.Type1, BaseFont=Name(base_font)
+            )
+        )
+
+    italic = font("/Courier-Oblique")
+    bold = font("/Courier-Bold")
+
+    def text(font_name, size, gray, x, y, value):
+        return [
+            ([], Operator("BT")),
+            ([font_name, size], Operator("Tf")),
+            ([gray], Operator("g")),
+            ([x, y], Operator("Td")),
+            ([pikepdf.String(value)], Operator("Tj")),
+            ([], Operator("ET")),
+        ]
+
+    for number, page in enumerate(pdf.pages, start=1):
+        left, bottom, right, top = (float(v) for v in page.mediabox)
+        text_left = left + LEFT_MARGIN
+        text_right = right - RIGHT_MARGIN
+        footer_y = bottom + HEADER_FOOTER_DISTANCE
+        page_no = str(number)
+
+        italic_name = page.add_resource(italic, Name.Font, Name("/Html2PdfItalic"))
+        bold_name = page.add_resource(bold, Name.Font, Name("/Html2PdfBold"))
+
+        ops = (
+            text(
+                italic_name, 9, GRAY25,
+                text_right - len(HEADER_TEXT) * 9 * COURIER_ADVANCE,
+                top - HEADER_FOOTER_DISTANCE - 9,
+                HEADER_TEXT,
+            )
+            + text(
+                bold_name, 11, 0,
+                (text_left + text_right - len(page_no) * 11 * COURIER_ADVANCE) / 2,
+                footer_y + 12,
+                page_no,
+            )
+            + text(
+                italic_name, 9, GRAY25,
+                text_right - len(FOOTER_TEXT) * 9 * COURIER_ADVANCE,
+                footer_y,
+                FOOTER_TEXT,
+            )
+        )
+
+        # Isolate the page's own graphics state from the overlay.
+        page.contents_add(pdf.make_stream(b"q\n"), prepend=True)
+        page.contents_add(
+            pdf.make_stream(b"Q\n" + pikepdf.unparse_content_stream(ops))
+        )
+
+
+# set_page_setup's page as CSS (top right bottom left margins).
+PAGE_STYLE = (
+    "<style>@page { size: 21cm 29.7cm; "
+    f"margin: {TOP_MARGIN:.2f}pt {RIGHT_MARGIN:.2f}pt "
+    f"{BOTTOM_MARGIN:.2f}pt {LEFT_MARGIN:.2f}pt }}</style>"
+).encode()
+
+
+def _copy_with_page_style(html_file: Path, copy_path: Path):
+    """
+    Copy one input for LibreOffice with PAGE_STYLE added. Left alone,
+    LibreOffice uses ~1 cm margins and the locale's paper size (Letter in
+    the US), so body text would run under the stamped header and footer.
+    A <base> keeps relative image and CSS links pointing at the original
+    folder.
+    """
+    data = html_file.read_bytes()
+    base = b""
+    if not re.search(rb"<base\b", data, re.I):
+        base = f'<base href="{html_file.resolve().parent.as_uri()}/">'.encode()
+
+    # The <base> must precede any relative link; the @page rule goes last
+    # in <head> so it wins over the document's own.
+    head = re.search(rb"<head\b[^>]*>", data, re.I)
+    head_end = re.search(rb"</head\s*>", data, re.I)
+    start = head.end() if head else 0
+    end = head_end.start() if head_end else start
+    copy_path.parent.mkdir(parents=True, exist_ok=True)
+    copy_path.write_bytes(
+        data[:start] + base + data[start:end] + PAGE_STYLE + data[end:]
+    )
+
+
+def _convert_with_soffice(html_files, output_pdf: Path) -> bool:
+    """
+    Convert the files with as few LibreOffice runs as possible (usually
+    one, so startup is paid once), then merge the PDFs in order and stamp
+    header/footer with pikepdf. Returns True if no file failed.
+    """
+    import pikepdf
+
+    with tempfile.TemporaryDirectory() as tmp_dir, ExitStack() as stack:
+        # LibreOffice names every output <stem>.pdf, so files sharing a
+        # stem (a.html and a.htm) must go to different output dirs: the
+        # n-th file with a given stem is converted in run n. Each run
+        # converts copies carrying the Word page layout.
+        runs = []
+        part_pdfs = {}
+        stem_counts = {}
+        for html_file in html_files:
+            stem = html_file.stem.lower()  # Windows paths are case-insensitive
+            n = stem_counts.get(stem, 0)
+            stem_counts[stem] = n + 1
+            if n == len(runs):
+                runs.append([])
+            copy_path = Path(tmp_dir, f"src{n}", html_file.name)
+            _copy_with_page_style(html_file, copy_path)
+            runs[n].append(copy_path)
+            part_pdfs[html_file] = Path(tmp_dir, f"run{n}", f"{html_file.stem}.pdf")
+
+        # A private profile keeps an already running LibreOffice from
+        # taking over the call (and producing nothing).
+        profile = Path(tmp_dir, "profile").as_uri()
+        for n, run_files in enumerate(runs):
+            subprocess.run(
+                [
+                    SOFFICE, f"-env:UserInstallation={profile}",
+                    "--headless", "--convert-to", "pdf",
+                    "--outdir", str(Path(tmp_dir, f"run{n}")),
+                    *map(str, run_files),
+                ],
+                check=True,
+            )
+
+        combined = pikepdf.new()
+        failed = 0
+        for html_file in tqdm(html_files, desc="Merging PDFs"):
+            part_pdf = part_pdfs[html_file]
+            if not part_pdf.exists():
+                failed += 1
+                tqdm.write(f"  ✖ Failed for {html_file.name}: no PDF from LibreOffice")
+                continue
+
+            # Copied pages read their streams lazily, so sources stay
+            # open until the combined file is saved.
+            part = stack.enter_context(pikepdf.open(part_pdf))
+            combined.pages.extend(part.pages)
+
+        if not combined.pages:
+            print("\nNo file could be converted; PDF not written.")
+            return False
+
+        _stamp_header_footer(combined)
+        output_pdf.parent.mkdir(parents=True, exist_ok=True)
+        combined.save(output_pdf)
+        print(f"\nAll HTML files combined into: {output_pdf}")
+
+    return failed == 0
 
 
 # ----------------------------------------------------------------------